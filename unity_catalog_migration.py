@@ -11,7 +11,20 @@
 # COMMAND ----------
 
 from typing import Dict, List, Literal, Optional
+import copy
+import functools
+import inspect
+import itertools
+import json
 import logging
+import operator
+import os
+import re
+import string
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 
 # Configure logging
@@ -32,6 +45,7 @@ logger = logging.getLogger(__name__)
 # MAGIC - `destination_table`: Target table name (optional, defaults to source_table)
 # MAGIC - `owner`: Table owner (user or group)
 # MAGIC - `sync_as_external`: For SYNC only - sync managed tables as external (default: False)
+# MAGIC - `depends_on`: Names of migrations that must complete first (optional)
 
 # COMMAND ----------
 
@@ -71,7 +85,8 @@ MIGRATION_CONFIG = {
     "global_settings": {
         "dry_run": False,
         "add_deprecation_comments": True,
-        "comment_template": "This table is deprecated. Please use {destination} instead of {source}."
+        "comment_template": "This table is deprecated. Please use {destination} instead of {source}.",
+        "max_parallelism": 8
     }
 }
 
@@ -82,148 +97,472 @@ MIGRATION_CONFIG = {
 
 # COMMAND ----------
 
+REQUIRED_FIELDS = ('migration_type', 'source_schema', 'destination_catalog', 'destination_schema', 'owner')
+MIGRATION_TYPES = frozenset({'SYNC', 'DEEP_CLONE'})
+# Users, groups and service principals (names, emails or application IDs)
+OWNER_PATTERN = re.compile(r"[A-Za-z0-9_\-@.+ ]+")
+
+# Exponential backoff bounds when polling SQL warehouse statements
+STATEMENT_POLL_INITIAL_SECONDS = 0.5
+STATEMENT_POLL_MAX_SECONDS = 10
+
+# SYNC command templates keyed by (table_level, sync_as_external)
+SYNC_TEMPLATES = {
+    (True, False): "SYNC TABLE {dest} FROM {src} SET OWNER {owner}",
+    (True, True): "SYNC TABLE {dest} AS EXTERNAL FROM {src} SET OWNER {owner}",
+    (False, False): "SYNC SCHEMA {dest} FROM {src} SET OWNER {owner}",
+    (False, True): "SYNC SCHEMA {dest} AS EXTERNAL FROM {src} SET OWNER {owner}",
+}
+
+# print_summary icons by result status (anything else, e.g. dry_run_success, gets 🔍)
+STATUS_ICONS = {
+    'completed': "✅",
+    'failed': "❌",
+    'blocked': "⛔",
+    'skipped': "⏭️",
+}
+
+def quote_identifier(*parts: str) -> str:
+    """Quote identifier parts with backticks and join them into a qualified name"""
+    return ".".join("`" + part.replace("`", "``") + "`" for part in parts)
+
+def quote_string(value: str) -> str:
+    """Quote a value as a SQL string literal"""
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
 class UnityMigrator:
+    # Statuses that allow dependent migrations to be scheduled
+    _SATISFIED_STATUSES = ('completed', 'dry_run_success', 'skipped')
+    # Fetches all required fields at once, raising KeyError on the first missing one
+    _required = operator.itemgetter(*REQUIRED_FIELDS)
+    
     def __init__(self, config: Dict):
         self.config = config
         self.results = []
         
+        # Bind global settings once rather than looking them up per migration
+        settings = config.get('global_settings', {})
+        self._dry_run = settings.get('dry_run', False)
+        self._add_comments = settings.get('add_deprecation_comments', True)
+        self._comment_tmpl = None
+        if self._add_comments:
+            if settings.get('comment_template') is not None:
+                self._comment_tmpl = self._compile_comment_template(settings['comment_template'])
+            else:
+                logger.warning("No comment_template configured, deprecation comments are disabled")
+                self._add_comments = False
+        self._max_parallelism = settings.get('max_parallelism', 8)
+        self._warehouse_id = settings.get('warehouse_id')
+        
+        # Submit through the SQL Statement Execution API when a warehouse is configured
+        self._client = None
+        if self._warehouse_id:
+            from databricks.sdk import WorkspaceClient
+            self._client = WorkspaceClient()
+        
+        # Migrations completed by earlier runs, keyed by "<source> -> <destination>"
+        self._state_file = settings.get('state_file')
+        self._state = set()
+        if self._state_file and os.path.exists(self._state_file):
+            with open(self._state_file) as f:
+                self._state = set(json.load(f))
+        
+        self._pending_comments = []
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def _compile_comment_template(template: str) -> string.Template:
+        """Precompile a str.format-style comment template into a string.Template
+        
+        Parsing with string.Formatter keeps str.format semantics: {{ and }} become literal
+        braces, and anything other than {destination} or {source} is rejected up front.
+        """
+        parts = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(template):
+            parts.append(literal.replace('$', '$$'))
+            if field is None:
+                continue
+            if field not in ('destination', 'source') or format_spec or conversion:
+                placeholder = field
+                if conversion:
+                    placeholder += f"!{conversion}"
+                if format_spec:
+                    placeholder += f":{format_spec}"
+                raise ValueError(f"Unsupported comment_template placeholder: {{{placeholder}}}")
+            parts.append(f"${{{field}}}")
+        return string.Template("".join(parts))
+    
     def validate_config(self, migration: Dict) -> bool:
         """Validate migration configuration"""
-        required_fields = ['migration_type', 'source_schema', 'destination_catalog', 'destination_schema', 'owner']
-        
-        for field in required_fields:
-            if field not in migration:
-                logger.error(f"Missing required field: {field} in migration {migration.get('name', 'unnamed')}")
-                return False
+        try:
+            self._required(migration)
+        except KeyError as e:
+            logger.error("Missing required field: %s in migration %s", e.args[0], migration.get('name', 'unnamed'))
+            return False
                 
-        if migration['migration_type'] not in ['SYNC', 'DEEP_CLONE']:
-            logger.error(f"Invalid migration_type: {migration['migration_type']}")
+        if migration['migration_type'] not in MIGRATION_TYPES:
+            logger.error("Invalid migration_type: %s", migration['migration_type'])
             return False
-            
+        
+        if not isinstance(migration['owner'], str) or not OWNER_PATTERN.fullmatch(migration['owner']):
+            logger.error("Invalid owner: %s", migration['owner'])
+            return False
+        
+        # Precompute object names once for the builders and comment writer
+        src_tbl = migration.get('source_table')
+        dst_tbl = migration.get('destination_table') or src_tbl
+        
+        if dst_tbl is not None and '`' in dst_tbl:
+            logger.error("Invalid destination_table: %s", dst_tbl)
+            return False
+        
+        source_parts = ['hive_metastore', migration['source_schema']]
+        dest_parts = [migration['destination_catalog'], migration['destination_schema']]
+        if src_tbl is None:
+            # Schema-level migrations have no destination table
+            migration['_dest_table'] = None
+        else:
+            source_parts.append(src_tbl)
+            dest_parts.append(dst_tbl)
+            migration['_dest_table'] = dst_tbl
+        
+        migration['_src_name'] = ".".join(source_parts)
+        migration['_dest_name'] = ".".join(dest_parts)
+        migration['_src_fqn'] = quote_identifier(*source_parts)
+        migration['_dest_fqn'] = quote_identifier(*dest_parts)
+        migration['_state_key'] = f"{migration['_src_fqn']} -> {migration['_dest_fqn']}"
+        migration['_q_owner'] = f"`{migration['owner']}`"
         return True
     
     def build_sync_command(self, migration: Dict) -> str:
-        """Build SYNC SQL command"""
-        source_path = f"hive_metastore.{migration['source_schema']}"
-        dest_path = f"{migration['destination_catalog']}.{migration['destination_schema']}"
-        
-        if 'source_table' in migration:
-            # Table-level sync
-            source_table = f"{source_path}.{migration['source_table']}"
-            dest_table = f"{dest_path}.{migration.get('destination_table', migration['source_table'])}"
-            
-            if migration.get('sync_as_external', False):
-                cmd = f"SYNC TABLE {dest_table} AS EXTERNAL FROM {source_table}"
-            else:
-                cmd = f"SYNC TABLE {dest_table} FROM {source_table}"
-        else:
-            # Schema-level sync
-            if migration.get('sync_as_external', False):
-                cmd = f"SYNC SCHEMA {dest_path} AS EXTERNAL FROM {source_path}"
-            else:
-                cmd = f"SYNC SCHEMA {dest_path} FROM {source_path}"
-        
-        cmd += f" SET OWNER `{migration['owner']}`"
-        return cmd
+        """Build SYNC SQL command (expects a migration prepared by validate_config)"""
+        template = SYNC_TEMPLATES[(migration['_dest_table'] is not None, bool(migration.get('sync_as_external', False)))]
+        return template.format_map({
+            'dest': migration['_dest_fqn'],
+            'src': migration['_src_fqn'],
+            'owner': migration['_q_owner']
+        })
     
     def build_clone_command(self, migration: Dict) -> str:
-        """Build DEEP CLONE SQL command"""
-        if 'source_table' not in migration:
+        """Build DEEP CLONE SQL command (expects a migration prepared by validate_config)"""
+        if migration['_dest_table'] is None:
             raise ValueError("DEEP_CLONE requires source_table to be specified")
-            
-        source_table = f"hive_metastore.{migration['source_schema']}.{migration['source_table']}"
-        dest_table = f"{migration['destination_catalog']}.{migration['destination_schema']}.{migration.get('destination_table', migration['source_table'])}"
         
-        return f"CREATE OR REPLACE TABLE {dest_table} DEEP CLONE {source_table}"
+        return f"CREATE OR REPLACE TABLE {migration['_dest_fqn']} DEEP CLONE {migration['_src_fqn']}"
+    
+    def _execute_sql(self, statement: str):
+        """Run a statement on the configured SQL warehouse, or on the SparkSession if none is set"""
+        if self._client is None:
+            spark.sql(statement)
+            return
+        
+        # Submit without waiting, then poll with exponential backoff
+        response = self._client.statement_execution.execute_statement(
+            statement=statement,
+            warehouse_id=self._warehouse_id,
+            wait_timeout='0s'
+        )
+        delay = STATEMENT_POLL_INITIAL_SECONDS
+        while response.status.state.value in ('PENDING', 'RUNNING'):
+            time.sleep(delay)
+            delay = min(delay * 2, STATEMENT_POLL_MAX_SECONDS)
+            response = self._client.statement_execution.get_statement(response.statement_id)
+        
+        if response.status.state.value != 'SUCCEEDED':
+            error = response.status.error.message if response.status.error else response.status.state.value
+            raise RuntimeError(f"Statement {response.statement_id} did not succeed: {error}")
+    
+    def _submit_batch(self, statements: List[str]):
+        """Submit a group of statements back-to-back
+        
+        Neither Spark nor the Statement Execution API accept multi-statement strings,
+        so statements run one at a time with no Python work in between. The first
+        failure stops the batch.
+        """
+        for statement in statements:
+            self._execute_sql(statement)
+    
+    def _invalidate_cached_metadata(self, migration: Dict):
+        """Drop cached utility lookups for objects written by a migration"""
+        catalog = migration['destination_catalog']
+        schema = migration['destination_schema']
+        
+        if migration['_dest_table'] is not None:
+            check_table_exists.invalidate(catalog, schema, migration['_dest_table'])
+            get_table_info.invalidate(catalog, schema, migration['_dest_table'])
+        else:
+            check_table_exists.invalidate(catalog, schema)
+            get_table_info.invalidate(catalog, schema)
+        
+        if catalog == 'hive_metastore':
+            list_hive_tables.invalidate(schema)
+            list_hive_tables.invalidate(None)
+    
+    def _record_state(self, migration: Dict):
+        """Write a completed migration through to the state file"""
+        if not self._state_file:
+            return
+        
+        with self._lock:
+            self._state.add(migration['_state_key'])
+            tmp_file = f"{self._state_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(sorted(self._state), f, indent=2)
+            os.replace(tmp_file, self._state_file)
     
     def execute_migration(self, migration: Dict) -> Dict:
         """Execute a single migration"""
         result = {
             'name': migration.get('name', 'unnamed'),
-            'migration_type': migration['migration_type'],
+            'migration_type': migration.get('migration_type'),
             'status': 'pending',
             'command': '',
             'error': None,
-            'start_time': datetime.now()
+            'start_time': datetime.now(),
+            '_t0_ns': time.perf_counter_ns()
         }
         
         try:
             if not self.validate_config(migration):
                 result['status'] = 'validation_failed'
+                result['_t1_ns'] = time.perf_counter_ns()
+                return result
+            
+            if migration['_state_key'] in self._state:
+                logger.info("Skipping migration '%s': already completed in a previous run", result['name'])
+                result['status'] = 'skipped'
+                result['_t1_ns'] = time.perf_counter_ns()
                 return result
             
-            # Build command
+            # Build commands
             if migration['migration_type'] == 'SYNC':
-                command = self.build_sync_command(migration)
+                statements = [self.build_sync_command(migration)]
             else:
-                command = self.build_clone_command(migration)
+                # Set ownership for DEEP_CLONE in the same batch (SYNC sets owner in command)
+                statements = [
+                    self.build_clone_command(migration),
+                    f"ALTER TABLE {migration['_dest_fqn']} SET OWNER {migration['_q_owner']}"
+                ]
             
+            command = ";\n".join(statements)
             result['command'] = command
-            logger.info(f"Executing migration '{result['name']}': {command}")
+            logger.info("Executing migration '%s': %s", result['name'], command)
             
-            # Execute command (or dry run)
-            if self.config['global_settings'].get('dry_run', False):
-                logger.info(f"DRY RUN - Would execute: {command}")
+            # Execute commands (or dry run)
+            if self._dry_run:
+                logger.info("DRY RUN - Would execute: %s", command)
                 result['status'] = 'dry_run_success'
             else:
-                spark.sql(command)
+                self._submit_batch(statements)
+                self._invalidate_cached_metadata(migration)
                 result['status'] = 'completed'
-                logger.info(f"Migration '{result['name']}' completed successfully")
-                
-                # Set ownership for DEEP_CLONE (SYNC sets owner in command)
-                if migration['migration_type'] == 'DEEP_CLONE':
-                    dest_table = f"{migration['destination_catalog']}.{migration['destination_schema']}.{migration.get('destination_table', migration['source_table'])}"
-                    owner_cmd = f"ALTER TABLE {dest_table} SET OWNER `{migration['owner']}`"
-                    if not self.config['global_settings'].get('dry_run', False):
-                        spark.sql(owner_cmd)
-                    logger.info(f"Set owner for {dest_table} to {migration['owner']}")
+                logger.info("Migration '%s' completed successfully", result['name'])
+                try:
+                    self._record_state(migration)
+                except Exception as e:
+                    # The DDL already ran, so a state write failure must not mark the migration failed
+                    logger.warning("Could not record migration '%s' in state file %s: %s", result['name'], self._state_file, e)
                 
         except Exception as e:
-            logger.error(f"Migration '{result['name']}' failed: {str(e)}")
+            logger.error("Migration '%s' failed: %s", result['name'], e)
             result['status'] = 'failed'
             result['error'] = str(e)
         
-        result['end_time'] = datetime.now()
+        result['_t1_ns'] = time.perf_counter_ns()
         return result
     
     def add_deprecation_comment(self, migration: Dict):
-        """Add deprecation comment to source table"""
-        if not self.config['global_settings'].get('add_deprecation_comments', True):
+        """Queue deprecation comment for a validated migration's source table (written by flush_deprecation_comments)"""
+        if not self._add_comments:
             return
             
-        if 'source_table' not in migration:
-            return  # Schema-level migrations don't need table comments
+        if migration['_dest_table'] is None or '_parent' in migration:
+            return  # Schema-level migrations (including their expanded tables) don't need table comments
             
         try:
-            source_table = f"hive_metastore.{migration['source_schema']}.{migration['source_table']}"
-            dest_table = f"{migration['destination_catalog']}.{migration['destination_schema']}.{migration.get('destination_table', migration['source_table'])}"
-            
-            comment = self.config['global_settings']['comment_template'].format(
-                destination=dest_table,
-                source=source_table
+            comment = self._comment_tmpl.substitute(
+                destination=migration['_dest_name'],
+                source=migration['_src_name']
             )
             
-            comment_cmd = f"COMMENT ON TABLE {source_table} IS '{comment}'"
+            comment_cmd = f"COMMENT ON TABLE {migration['_src_fqn']} IS {quote_string(comment)}"
             
-            if not self.config['global_settings'].get('dry_run', False):
-                spark.sql(comment_cmd)
-            logger.info(f"Added deprecation comment to {source_table}")
+            if not self._dry_run:
+                with self._lock:
+                    self._pending_comments.append((migration, comment_cmd))
             
         except Exception as e:
-            logger.warning(f"Failed to add deprecation comment: {str(e)}")
+            logger.warning("Failed to add deprecation comment: %s", e)
     
-    def run_migrations(self) -> List[Dict]:
-        """Run all configured migrations"""
-        logger.info(f"Starting migration batch with {len(self.config['migrations'])} migrations")
+    def flush_deprecation_comments(self):
+        """Write all queued deprecation comments in one pass"""
+        with self._lock:
+            pending, self._pending_comments = self._pending_comments, []
         
-        for migration in self.config['migrations']:
-            result = self.execute_migration(migration)
+        for migration, comment_cmd in pending:
+            try:
+                self._execute_sql(comment_cmd)
+                get_table_info.invalidate('hive_metastore', migration['source_schema'], migration['source_table'])
+                logger.info("Added deprecation comment to %s", migration['_src_name'])
+            except Exception as e:
+                logger.warning("Failed to add deprecation comment to %s: %s", migration['_src_name'], e)
+    
+    def _run_migration(self, migration: Dict) -> Dict:
+        """Execute a migration and queue its deprecation comment (runs on a worker thread)"""
+        result = self.execute_migration(migration)
+        
+        # Queue deprecation comment if migration succeeded
+        if result['status'] == 'completed':
+            self.add_deprecation_comment(migration)
+        
+        with self._lock:
             self.results.append(result)
+        return result
+    
+    def _record_unexecuted(self, migration: Dict, status: str, error: str):
+        """Record a result for a migration that was never executed"""
+        now_ns = time.perf_counter_ns()
+        logger.error("Migration '%s' not executed: %s", migration.get('name', 'unnamed'), error)
+        with self._lock:
+            self.results.append({
+                'name': migration.get('name', 'unnamed'),
+                'migration_type': migration.get('migration_type'),
+                'status': status,
+                'command': '',
+                'error': error,
+                'start_time': datetime.now(),
+                '_t0_ns': now_ns,
+                '_t1_ns': now_ns
+            })
+    
+    def _expand_schema_sync(self, name: str, migration: Dict) -> Dict[str, Dict]:
+        """Split a schema-level SYNC into one table-level SYNC per source table
+        
+        Each table is synced with its owner in a single statement, instead of SYNC SCHEMA
+        followed by a second ownership pass over the synced objects. Views are left out,
+        as SYNC SCHEMA only upgrades tables. Returns the migration unchanged when the
+        schema has no tables, so it still runs (and is reported) as SYNC SCHEMA.
+        """
+        tables = list_hive_tables(migration['source_schema'], tables_only=True)
+        if not tables:
+            logger.info("No tables listed for schema-level migration '%s', keeping SYNC SCHEMA", name)
+            return {name: migration}
+        
+        logger.info("Expanded schema-level migration '%s' into %d table migrations", name, len(tables))
+        # destination_table never applied to schema-level migrations; each table keeps its own name
+        base = {key: value for key, value in migration.items() if key != 'destination_table'}
+        return {
+            f"{name}.{table}": {**base, 'name': f"{name}.{table}", 'source_table': table, '_parent': name}
+            for table in tables
+        }
+    
+    def _migrations_by_name(self) -> Dict[str, Dict]:
+        """Index configured migrations by name (unnamed migrations get a positional key)
+        
+        Schema-level SYNCs are expanded into per-table migrations; each expanded migration
+        records the configured name it came from under `_parent`.
+        """
+        migrations = {}
+        for index, migration in enumerate(self.config['migrations']):
+            name = migration.get('name', f"unnamed_{index}")
+            expanded = {name: migration}
+            if migration.get('migration_type') == 'SYNC' and migration.get('source_table') is None and 'owner' in migration:
+                try:
+                    expanded = self._expand_schema_sync(name, migration)
+                except Exception as e:
+                    logger.warning("Could not list tables for '%s', falling back to SYNC SCHEMA: %s", name, e)
             
-            # Add deprecation comment if migration succeeded
-            if result['status'] == 'completed':
-                self.add_deprecation_comment(migration)
+            for expanded_name, expanded_migration in expanded.items():
+                if expanded_name in migrations:
+                    raise ValueError(f"Duplicate migration name: {expanded_name}")
+                migrations[expanded_name] = expanded_migration
+        return migrations
+    
+    def _build_dependency_graph(self, migrations: Dict[str, Dict]) -> Dict[str, set]:
+        """Map each migration name to the names of the migrations that must finish first
         
+        A migration depends on the migrations listed in its `depends_on` field, on any
+        schema-level SYNC into its destination schema, and on any migration writing
+        into its source schema.
+        """
+        groups = {}
+        writers = {}
+        schema_syncs = {}
+        for name, migration in migrations.items():
+            groups.setdefault(migration.get('_parent', name), set()).add(name)
+            destination = (migration.get('destination_catalog'), migration.get('destination_schema'))
+            writers.setdefault(destination, set()).add(name)
+            # Tables expanded from a schema-level SYNC still count as that schema SYNC
+            if migration.get('migration_type') == 'SYNC' and (migration.get('source_table') is None or '_parent' in migration):
+                schema_syncs.setdefault(destination, set()).add(name)
+        
+        graph = {}
+        for name, migration in migrations.items():
+            depends_on = set(migration.get('depends_on', []))
+            unknown = depends_on - groups.keys()
+            if unknown:
+                raise ValueError(f"Migration '{name}' depends on unknown migrations: {sorted(unknown)}")
+            
+            # A dependency on an expanded schema-level SYNC waits for all of its tables
+            prereqs = set().union(*(groups[dependency] for dependency in depends_on))
+            
+            # Only configured table-level migrations wait; expanded tables keep schema-level
+            # semantics, so they never wait on their siblings or other schema SYNCs
+            if migration.get('source_table') is not None and '_parent' not in migration:
+                destination = (migration.get('destination_catalog'), migration.get('destination_schema'))
+                prereqs |= schema_syncs.get(destination, set())
+            prereqs |= writers.get(('hive_metastore', migration.get('source_schema')), set())
+            
+            prereqs.discard(name)
+            graph[name] = prereqs
+        return graph
+    
+    def run_migrations(self) -> List[Dict]:
+        """Run all configured migrations, scheduling each once its dependencies have completed"""
+        migrations = self._migrations_by_name()
+        graph = self._build_dependency_graph(migrations)
+        logger.info("Starting migration batch with %d migrations (max_parallelism=%d)", len(migrations), self._max_parallelism)
+        
+        dependents = {name: set() for name in graph}
+        for name, prereqs in graph.items():
+            for prereq in prereqs:
+                dependents[prereq].add(name)
+        indegree = {name: len(prereqs) for name, prereqs in graph.items()}
+        blocked = set()
+        
+        # Scheduling state is only touched on this thread; workers just execute migrations
+        with ThreadPoolExecutor(max_workers=self._max_parallelism) as executor:
+            pending = {
+                executor.submit(self._run_migration, migrations[name]): name
+                for name, count in indegree.items() if count == 0
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    result = future.result()
+                    
+                    if result['status'] not in self._SATISFIED_STATUSES:
+                        # Block everything downstream of a failed migration
+                        stack = [name]
+                        while stack:
+                            for dependent in dependents[stack.pop()]:
+                                if dependent not in blocked:
+                                    blocked.add(dependent)
+                                    stack.append(dependent)
+                                    self._record_unexecuted(migrations[dependent], 'blocked', f"Dependency '{name}' did not complete")
+                        continue
+                    
+                    for dependent in dependents[name]:
+                        indegree[dependent] -= 1
+                        if indegree[dependent] == 0 and dependent not in blocked:
+                            pending[executor.submit(self._run_migration, migrations[dependent])] = dependent
+        
+        for name, count in indegree.items():
+            if count > 0 and name not in blocked:
+                self._record_unexecuted(migrations[name], 'failed', "Circular dependency between migrations")
+        
+        self.flush_deprecation_comments()
         return self.results
     
     def print_summary(self):
@@ -232,20 +571,19 @@ class UnityMigrator:
         print("MIGRATION SUMMARY")
         print("="*80)
         
-        total = len(self.results)
-        completed = len([r for r in self.results if r['status'] == 'completed'])
-        failed = len([r for r in self.results if r['status'] == 'failed'])
-        dry_run = len([r for r in self.results if r['status'] == 'dry_run_success'])
+        counts = Counter(r['status'] for r in self.results)
         
-        print(f"Total migrations: {total}")
-        print(f"Completed: {completed}")
-        print(f"Failed: {failed}")
-        print(f"Dry run: {dry_run}")
+        print(f"Total migrations: {len(self.results)}")
+        print(f"Completed: {counts['completed']}")
+        print(f"Failed: {counts['failed']}")
+        print(f"Dry run: {counts['dry_run_success']}")
+        print(f"Skipped: {counts['skipped']}")
+        print(f"Blocked: {counts['blocked']}")
         print()
         
         for result in self.results:
-            status_icon = "✅" if result['status'] == 'completed' else "❌" if result['status'] == 'failed' else "🔍"
-            duration = (result.get('end_time', datetime.now()) - result['start_time']).total_seconds()
+            status_icon = STATUS_ICONS.get(result['status'], "🔍")
+            duration = (result.get('_t1_ns', time.perf_counter_ns()) - result['_t0_ns']) / 1e9
             print(f"{status_icon} {result['name']} ({result['migration_type']}) - {result['status']} ({duration:.1f}s)")
             
             if result.get('error'):
@@ -256,63 +594,243 @@ class UnityMigrator:
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Execute Migrations
+# MAGIC ## Utility Functions for Manual Operations
 
 # COMMAND ----------
 
-# Initialize migrator
-migrator = UnityMigrator(MIGRATION_CONFIG)
-
-# Run migrations
-results = migrator.run_migrations()
-
-# Print summary
-migrator.print_summary()
+def ttl_cache(seconds: int = 60, on_error=None):
+    """Memoize a function's results by argument values for `seconds`
+    
+    Only successful results are cached, and callers always receive a copy, so mutating
+    a result never leaks into later calls. With `on_error`, an exception is turned into
+    the uncached value `on_error(exception)` instead of propagating.
+    
+    The wrapped function gains an `invalidate(*prefix)` method that drops cached
+    entries whose leading arguments match `prefix` (all entries when called bare).
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        cache = {}
+        lock = threading.Lock()
+        
+        def make_key(args, kwargs) -> tuple:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return tuple(bound.arguments.values())
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            now = time.monotonic()
+            with lock:
+                entry = cache.get(key)
+            if entry is not None and entry[1] > now:
+                return copy.deepcopy(entry[0])
+            
+            try:
+                value = func(*args, **kwargs)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                return on_error(e)
+            
+            with lock:
+                cache[key] = (copy.deepcopy(value), now + seconds)
+            return value
+        
+        def invalidate(*prefix):
+            with lock:
+                for key in [key for key in cache if key[:len(prefix)] == prefix]:
+                    del cache[key]
+        
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
 
-# COMMAND ----------
+@ttl_cache(seconds=60, on_error=lambda e: False)
+def check_table_exists(catalog: str, schema: str, table: str) -> bool:
+    """Check if a table exists in Unity Catalog
+    
+    Uses system.information_schema, which does not cover hive_metastore tables. Returns
+    False if the lookup fails (e.g. no access to system.information_schema).
+    """
+    rows = spark.sql(
+        "SELECT 1 FROM system.information_schema.tables "
+        "WHERE table_catalog = :catalog AND table_schema = :schema AND table_name = :table",
+        args={"catalog": catalog.lower(), "schema": schema.lower(), "table": table.lower()}
+    ).limit(1).collect()
+    return len(rows) > 0
 
-# MAGIC %md
-# MAGIC ## Utility Functions for Manual Operations
+def check_tables_exist(tables: List[tuple]) -> Dict[tuple, bool]:
+    """Check which (catalog, schema, table) tuples exist in Unity Catalog using a single query
+    
+    Like check_table_exists, hive_metastore tables are not covered.
+    """
+    if not tables:
+        return {}
+    
+    args = {}
+    for i, (c, s, t) in enumerate(tables):
+        args.update({f"c{i}": c.lower(), f"s{i}": s.lower(), f"t{i}": t.lower()})
+    values = ", ".join(f"(:c{i}, :s{i}, :t{i})" for i in range(len(tables)))
+    df = spark.sql(
+        f"SELECT v.c, v.s, v.t FROM VALUES {values} AS v(c, s, t) "
+        "LEFT SEMI JOIN system.information_schema.tables i "
+        "ON i.table_catalog = v.c AND i.table_schema = v.s AND i.table_name = v.t",
+        args=args
+    )
+    existing = {(row.c, row.s, row.t) for row in df.collect()}
+    return {(c, s, t): (c.lower(), s.lower(), t.lower()) in existing for c, s, t in tables}
 
-# COMMAND ----------
+@ttl_cache(seconds=60, on_error=lambda e: {"exists": False, "error": str(e)})
+def get_table_info(catalog: str, schema: str, table: str) -> Dict:
+    """Get detailed information about a table as a mapping of DESCRIBE EXTENDED col_name to data_type"""
+    df = spark.sql(
+        "DESCRIBE TABLE EXTENDED IDENTIFIER(:table)",
+        args={"table": quote_identifier(catalog, schema, table)}
+    )
+    # Stream rows into the mapping rather than materializing the full result on the driver
+    info = {row.col_name: row.data_type for row in df.toLocalIterator()}
+    return {"exists": True, "info": info}
 
-def check_table_exists(catalog: str, schema: str, table: str) -> bool:
-    """Check if a table exists in Unity Catalog"""
-    try:
-        spark.sql(f"DESCRIBE TABLE {catalog}.{schema}.{table}")
-        return True
-    except:
-        return False
+# Cleared once a query shows hive_metastore exposes no information_schema
+_hive_information_schema_available = True
+# Error classes meaning hive_metastore.information_schema itself does not exist
+_INFORMATION_SCHEMA_MISSING_ERRORS = ('TABLE_OR_VIEW_NOT_FOUND', 'SCHEMA_NOT_FOUND')
 
-def get_table_info(catalog: str, schema: str, table: str) -> Dict:
-    """Get detailed information about a table"""
-    try:
-        df = spark.sql(f"DESCRIBE EXTENDED {catalog}.{schema}.{table}")
-        return {"exists": True, "info": df.collect()}
-    except Exception as e:
-        return {"exists": False, "error": str(e)}
+def list_hive_tables_many(schemas: List[str], tables_only: bool = False) -> Dict[str, List[str]]:
+    """List tables for several hive_metastore schemas with a single information_schema query
+    
+    With `tables_only`, views and temporary views are excluded. Raises ValueError if any
+    schema does not exist, on both the information_schema and the per-schema SHOW TABLES path.
+    """
+    global _hive_information_schema_available
+    if not schemas:
+        return {}
+    
+    if _hive_information_schema_available:
+        markers = ", ".join(f":s{i}" for i in range(len(schemas)))
+        try:
+            # Join from schemata so empty schemas are distinguishable from missing ones
+            table_filter = " AND t.table_type IN ('MANAGED', 'EXTERNAL')" if tables_only else ""
+            df = spark.sql(
+                "SELECT s.schema_name, t.table_name "
+                "FROM hive_metastore.information_schema.schemata s "
+                f"LEFT JOIN hive_metastore.information_schema.tables t ON t.table_schema = s.schema_name{table_filter} "
+                f"WHERE s.schema_name IN ({markers})",
+                args={f"s{i}": schema.lower() for i, schema in enumerate(schemas)}
+            )
+            rows = sorted(df.toPandas().itertuples(index=False), key=lambda row: (row.schema_name, row.table_name or ''))
+        except Exception as e:
+            if not any(error in str(e) for error in _INFORMATION_SCHEMA_MISSING_ERRORS):
+                raise
+            logger.warning("hive_metastore.information_schema unavailable, listing schemas individually: %s", e)
+            _hive_information_schema_available = False
+        else:
+            tables = {
+                schema_name: [row.table_name for row in group if row.table_name is not None]
+                for schema_name, group in itertools.groupby(rows, key=lambda row: row.schema_name)
+            }
+            missing = [schema for schema in schemas if schema.lower() not in tables]
+            if missing:
+                raise ValueError(f"Schemas not found in hive_metastore: {missing}")
+            return {schema: tables[schema.lower()] for schema in schemas}
+    
+    result = {}
+    for schema in schemas:
+        try:
+            schema_path = quote_identifier('hive_metastore', schema)
+            df = spark.sql(f"SHOW TABLES IN {schema_path}")
+            views = set()
+            if tables_only:
+                df = df.where("NOT isTemporary")
+                views = set(spark.sql(f"SHOW VIEWS IN {schema_path}").select("viewName").toPandas()["viewName"].tolist())
+            # toPandas transfers the result as Arrow batches instead of row-by-row through Py4J
+            tables = df.select("tableName").toPandas()["tableName"].tolist()
+            result[schema] = [table for table in tables if table not in views]
+        except Exception as e:
+            if 'SCHEMA_NOT_FOUND' not in str(e):
+                raise
+            raise ValueError(f"Schemas not found in hive_metastore: {[schema]}") from e
+    return result
 
-def list_hive_tables(schema: str = None) -> List[str]:
-    """List tables in hive_metastore"""
+@ttl_cache(seconds=60)
+def list_hive_tables(schema: str = None, tables_only: bool = False) -> List[str]:
+    """List tables in hive_metastore (`tables_only` excludes views and requires a schema)"""
     if schema:
-        df = spark.sql(f"SHOW TABLES IN hive_metastore.{schema}")
-    else:
-        df = spark.sql("SHOW TABLES IN hive_metastore")
-    return [row.tableName for row in df.collect()]
+        return list_hive_tables_many([schema], tables_only)[schema]
+    if tables_only:
+        raise ValueError("tables_only requires a schema")
+    
+    df = spark.sql("SHOW TABLES IN hive_metastore")
+    return df.select("tableName").toPandas()["tableName"].tolist()
 
 def validate_permissions(catalog: str, schema: str) -> Dict:
-    """Validate permissions on Unity Catalog objects"""
+    """Validate the current user can create tables in a Unity Catalog schema
+    
+    Requires USE_CATALOG on the catalog plus USE_SCHEMA and CREATE_TABLE on the schema
+    (or ALL_PRIVILEGES). Owning the schema stands in for the schema privileges and
+    owning the catalog for all of them. Grants and ownership count whether held directly
+    or through one of the user's groups.
+    """
     try:
-        # Try to create and drop a temporary table to test permissions
-        test_table = f"{catalog}.{schema}.permission_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        spark.sql(f"CREATE TABLE {test_table} (test_col STRING) USING DELTA")
-        spark.sql(f"DROP TABLE {test_table}")
-        return {"has_permissions": True}
+        from databricks.sdk import WorkspaceClient
+        
+        # Read effective grants and ownership instead of creating a test table
+        client = WorkspaceClient()
+        me = client.current_user.me()
+        principals = {me.user_name} | {group.display for group in me.groups or []}
+        
+        def effective_privileges(securable_type: str, full_name: str) -> set:
+            # Privileges are usually granted to groups, so keep assignments for any of the user's principals
+            permissions = client.grants.get_effective(securable_type=securable_type, full_name=full_name)
+            return {
+                privilege.privilege.value
+                for assignment in permissions.privilege_assignments or []
+                if assignment.principal in principals
+                for privilege in assignment.privileges or []
+            }
+        
+        schema_name = f"{catalog}.{schema}"
+        catalog_privileges = effective_privileges('CATALOG', catalog)
+        schema_privileges = effective_privileges('SCHEMA', schema_name)
+        owns_catalog = client.catalogs.get(catalog).owner in principals
+        owns_schema = client.schemas.get(schema_name).owner in principals
+        
+        can_use_catalog = owns_catalog or bool({'USE_CATALOG', 'ALL_PRIVILEGES'} & catalog_privileges)
+        can_create_table = (
+            owns_catalog or owns_schema
+            or 'ALL_PRIVILEGES' in schema_privileges
+            or {'USE_SCHEMA', 'CREATE_TABLE'} <= schema_privileges
+        )
+        return {
+            "has_permissions": can_use_catalog and can_create_table,
+            "privileges": sorted(schema_privileges),
+            "catalog_privileges": sorted(catalog_privileges),
+            "owns_schema": owns_schema,
+            "owns_catalog": owns_catalog
+        }
     except Exception as e:
         return {"has_permissions": False, "error": str(e)}
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## Execute Migrations
+
+# COMMAND ----------
+
+# Initialize migrator
+migrator = UnityMigrator(MIGRATION_CONFIG)
+
+# Run migrations
+results = migrator.run_migrations()
+
+# Print summary
+migrator.print_summary()
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Manual Testing and Validation
 